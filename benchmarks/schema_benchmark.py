@@ -0,0 +1,390 @@
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from absl import app
+from absl import flags
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.extend(
+    [os.path.join(ROOT_DIR, "example_01"), os.path.join(ROOT_DIR, "example_02")]
+)
+
+import data_pb2  # noqa: E402
+import patient_info_pb2  # noqa: E402
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list("sizes", ["1000", "10000", "100000"], "Total electrode counts")
+flags.DEFINE_integer("electrodes_per_conversation", 100, "Electrodes per conversation")
+flags.DEFINE_integer("lookups", 1000, "Number of point lookups per case")
+flags.DEFINE_integer("repeats", 3, "Repeats per timing, the best one is reported")
+flags.DEFINE_integer("seed", 0, "Random seed for the lookup keys")
+
+SCHEMAS = ["data", "patient_info"]
+
+
+def make_content(
+    num_electrodes: int, electrodes_per_conversation: int
+) -> List[Tuple[str, str, str, List[Tuple[str, str]]]]:
+    """
+    Generates synthetic manifest content shared by both schemas.
+
+    Args:
+        num_electrodes (int): The total number of electrodes.
+        electrodes_per_conversation (int): The number of electrodes in each
+          conversation.
+
+    Returns:
+        List[Tuple[str, str, str, List[Tuple[str, str]]]]: One entry per
+        conversation with its name, datum name, datum checksum and the
+        (name, checksum) pairs of its electrodes.
+    """
+    content = []
+    num_conversations = -(-num_electrodes // electrodes_per_conversation)
+    for idx in range(num_conversations):
+        conversation = f"NY625_418-419_Part1_conversation{idx + 1}"
+        first = idx * electrodes_per_conversation
+        last = min(first + electrodes_per_conversation, num_electrodes)
+        electrodes = [
+            (
+                f"{conversation}_electrode_preprocess_file_{e - first + 1}.mat",
+                f"{e:064x}",
+            )
+            for e in range(first, last)
+        ]
+        content.append(
+            (
+                conversation,
+                f"{conversation}_datum_conversation_trimmed.txt",
+                f"{num_electrodes + idx:064x}",
+                electrodes,
+            )
+        )
+    return content
+
+
+def add_outer_map_entry(
+    my_message: data_pb2.Data,
+    outer_map: str,
+    outer_key: str,
+    inner_key: Any,
+    inner_value: Any,
+) -> None:
+    """
+    Adds an entry to an outer map with the linear scan of `example_01`.
+
+    A copy of `add_outer_map_entry` in `example_01/add_patient.py`, which
+    cannot be imported here because it defines required flags.
+    """
+    outer_entry = next(
+        (
+            entry
+            for entry in getattr(my_message, outer_map)
+            if entry.outer_key == outer_key
+        ),
+        None,
+    )
+    if outer_entry is None:
+        outer_entry = getattr(my_message, outer_map).add(outer_key=outer_key)
+    outer_entry.inner_map.add(inner_key=inner_key, inner_value=inner_value)
+
+
+def build_data(content) -> data_pb2.Data:
+    """
+    Builds an `example_01` `Data` message the way its `add_patient.py` does.
+
+    Conversations, datum checksums and electrode counts go through
+    `add_outer_map_entry`, electrode checksums through the nested maps as in
+    `create_sample_message`.
+
+    Args:
+        content: The synthetic content from `make_content`.
+
+    Returns:
+        data_pb2.Data: The populated message.
+    """
+    data = data_pb2.Data()
+    data.subject_id = "625"
+    data.num_conversations = len(content)
+
+    for idx, (conversation, _, _, _) in enumerate(content):
+        add_outer_map_entry(
+            data, "outer_map1", "conversations", f"{idx:03}", conversation
+        )
+
+    for conversation, _, datum_checksum, _ in content:
+        add_outer_map_entry(
+            data, "outer_map1", "datum_checksums", conversation, datum_checksum
+        )
+
+    for conversation, _, _, electrodes in content:
+        add_outer_map_entry(
+            data, "outer_map2", "electrode_counts", conversation, len(electrodes)
+        )
+
+    checksums = data.outer_map["electrode_checksums"]
+    for conversation, _, _, electrodes in content:
+        middle_entry = checksums.middle_map[conversation]
+        for name, checksum in electrodes:
+            middle_entry.inner_map[name].inner_value = checksum
+
+    return data
+
+
+def build_patient_info(content) -> patient_info_pb2.PatientInfo:
+    """
+    Builds an `example_02` `PatientInfo` message the way its `add_patient.py`
+    does.
+
+    Args:
+        content: The synthetic content from `make_content`.
+
+    Returns:
+        patient_info_pb2.PatientInfo: The populated message.
+    """
+    patient_info = patient_info_pb2.PatientInfo()
+    patient = patient_info.patients.add()
+    patient.project_type = patient_info_pb2.TFS
+    patient.patient_id = "625"
+
+    for name, datum_name, datum_checksum, electrodes in content:
+        conversation = patient.conversations.add()
+        conversation.name = name
+        conversation.datum.name = datum_name
+        conversation.datum.checksum = datum_checksum
+        for electrode_name, electrode_checksum in electrodes:
+            electrode = conversation.datum.electrodes.add()
+            electrode.name = electrode_name
+            electrode.checksum = electrode_checksum
+
+    return patient_info
+
+
+def lookup_data(data: data_pb2.Data, conversation: str, electrode: str) -> str:
+    """Returns the checksum of an electrode from a `Data` message."""
+    middle_map = data.outer_map["electrode_checksums"].middle_map
+    return middle_map[conversation].inner_map[electrode].inner_value
+
+
+def lookup_patient_info(
+    patient_info: patient_info_pb2.PatientInfo, conversation: str, electrode: str
+) -> str:
+    """Returns the checksum of an electrode from a `PatientInfo` message."""
+    for patient in patient_info.patients:
+        for entry in patient.conversations:
+            if entry.name != conversation:
+                continue
+            for item in entry.datum.electrodes:
+                if item.name == electrode:
+                    return item.checksum
+    return ""
+
+
+BUILDERS: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "data": (build_data, data_pb2.Data, lookup_data),
+    "patient_info": (
+        build_patient_info,
+        patient_info_pb2.PatientInfo,
+        lookup_patient_info,
+    ),
+}
+
+
+def best_of(repeats: int, func: Callable, *args):
+    """
+    Runs a function several times and returns its fastest time and last result.
+
+    The previous result is dropped before every run, so at most one result
+    is alive at a time.
+
+    Args:
+        repeats (int): The number of runs.
+        func (Callable): The function to time.
+        *args: The arguments to pass to the function.
+
+    Returns:
+        Tuple[float, Any]: The best wall time in seconds and the result.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        result = None
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def get_peak_rss() -> float:
+    """
+    Returns the peak RSS of the process in MB.
+
+    Reads `VmHWM` where available: on Linux `ru_maxrss` survives `exec`, so
+    a spawned worker would report the peak of its parent.
+
+    Returns:
+        float: The peak RSS in MB.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_build(
+    schema: str, num_electrodes: int, electrodes_per_conversation: int, repeats: int
+) -> Tuple[Dict[str, float], bytes]:
+    """
+    Benchmarks building one schema at one size.
+
+    Runs in a fresh worker process, so the peak RSS growth only covers the
+    built message.
+
+    Args:
+        schema (str): The schema to benchmark, one of `SCHEMAS`.
+        num_electrodes (int): The total number of electrodes.
+        electrodes_per_conversation (int): The number of electrodes in each
+          conversation.
+        repeats (int): The number of runs per timing.
+
+    Returns:
+        Tuple[Dict[str, float], bytes]: The build measurements and the
+        serialized message.
+    """
+    build, _, _ = BUILDERS[schema]
+    content = make_content(num_electrodes, electrodes_per_conversation)
+
+    rss_before = get_peak_rss()
+    build_time, message = best_of(repeats, build, content)
+    build_peak = get_peak_rss() - rss_before
+
+    return {"build_s": build_time, "build_peak_mb": build_peak}, (
+        message.SerializeToString()
+    )
+
+
+def run_parse(
+    schema: str,
+    serialized_file: str,
+    num_electrodes: int,
+    electrodes_per_conversation: int,
+    lookups: int,
+    repeats: int,
+    seed: int,
+) -> Dict[str, float]:
+    """
+    Benchmarks parsing and point lookups of one schema at one size.
+
+    Runs in a fresh worker process that never builds the message, so the
+    peak RSS growth only covers the parsed message.
+
+    Args:
+        schema (str): The schema to benchmark, one of `SCHEMAS`.
+        serialized_file (str): The file holding the message serialized by
+          `run_build`.
+        num_electrodes (int): The total number of electrodes.
+        electrodes_per_conversation (int): The number of electrodes in each
+          conversation.
+        lookups (int): The number of point lookups.
+        repeats (int): The number of runs per timing.
+        seed (int): The random seed for the lookup keys.
+
+    Returns:
+        Dict[str, float]: The parse and lookup measurements.
+    """
+    _, message_type, lookup = BUILDERS[schema]
+    with open(serialized_file, "rb") as f:
+        serialized = f.read()
+
+    rss_before = get_peak_rss()
+    parse_time, message = best_of(repeats, message_type.FromString, serialized)
+    parse_peak = get_peak_rss() - rss_before
+
+    content = make_content(num_electrodes, electrodes_per_conversation)
+    rng = random.Random(seed)
+    keys = []
+    for _ in range(lookups):
+        conversation, _, _, electrodes = rng.choice(content)
+        keys.append((conversation, rng.choice(electrodes)[0]))
+    del content
+
+    def lookup_all():
+        for conversation, electrode in keys:
+            lookup(message, conversation, electrode)
+
+    lookup_time, _ = best_of(repeats, lookup_all)
+
+    return {
+        "parse_s": parse_time,
+        "parse_peak_mb": parse_peak,
+        "lookup_us": lookup_time / max(lookups, 1) * 1e6,
+    }
+
+
+def run_in_worker(func: Callable, *args):
+    """
+    Runs a function in a fresh spawned process and returns its result.
+
+    Args:
+        func (Callable): The function to run.
+        *args: The arguments to pass to the function.
+
+    Returns:
+        Any: The result of the function.
+    """
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def main(_):
+    # Populates both schemas with identical content and compares them.
+    header = (
+        f"{'schema':<14}{'electrodes':>11}{'build_s':>10}{'build_mb':>10}"
+        f"{'size_bytes':>12}{'parse_s':>10}{'parse_mb':>10}{'lookup_us':>11}"
+    )
+    print(header)
+
+    for size in FLAGS.sizes:
+        for schema in SCHEMAS:
+            build_result, serialized = run_in_worker(
+                run_build,
+                schema,
+                int(size),
+                FLAGS.electrodes_per_conversation,
+                FLAGS.repeats,
+            )
+            # The bytes go through a file, a pickled transfer would raise the
+            # worker's peak RSS before parsing starts.
+            with tempfile.NamedTemporaryFile(suffix=".pb") as f:
+                f.write(serialized)
+                f.flush()
+                parse_result = run_in_worker(
+                    run_parse,
+                    schema,
+                    f.name,
+                    int(size),
+                    FLAGS.electrodes_per_conversation,
+                    FLAGS.lookups,
+                    FLAGS.repeats,
+                    FLAGS.seed,
+                )
+            print(
+                f"{schema:<14}{int(size):>11}{build_result['build_s']:>10.3f}"
+                f"{build_result['build_peak_mb']:>10.1f}{len(serialized):>12}"
+                f"{parse_result['parse_s']:>10.4f}"
+                f"{parse_result['parse_peak_mb']:>10.1f}"
+                f"{parse_result['lookup_us']:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    app.run(main)
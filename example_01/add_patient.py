@@ -2,6 +2,7 @@ import glob
 import hashlib
 import json
 import os
+import sys
 from collections import defaultdict
 from typing import Any, Dict, List, Optional
 
@@ -9,6 +10,9 @@ from absl import app, flags
 
 import data_pb2
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import layout  # noqa: E402
+
 EXCLUDE_WORDS = ["sp", "{lg}", "{ns}", "{LG}", "{NS}", "SP"]
 
 NON_WORDS = ["hm", "huh", "mhm", "mm", "oh", "uh", "uhuh", "um"]
@@ -29,25 +33,6 @@ SUBJECTS = {
     "tfs": ["625", "676", "7170", "798", "7986"],
 }
 
-ELECTRODE_FOLDER_MAP = {
-    "podcast": dict.fromkeys(
-        SUBJECTS["podcast"],
-        "preprocessed_all",
-    ),
-    "tfs": dict.fromkeys(["625", "676"], "preprocessed")
-    | dict.fromkeys(["7170"], "preprocessed_v2")
-    | dict.fromkeys(["798"], "preprocessed_allElec"),
-}
-
-DATUM_FILE_MAP = {
-    "podcast": dict.fromkeys(
-        SUBJECTS["podcast"],
-        "*trimmed.txt",
-    ),
-    "tfs": dict.fromkeys(["625", "676"], "*trimmed.txt")
-    | dict.fromkeys(["7170", "798"], "*_datum_trimmed.txt"),
-}
-
 CONVERSATIONS_MAP = {
     "podcast": dict.fromkeys(
         SUBJECTS["podcast"],
@@ -61,6 +46,7 @@ FLAGS = flags.FLAGS
 flags.DEFINE_string("project", None, "Project ID")
 flags.DEFINE_string("subject", None, "Subject ID")
 flags.DEFINE_string("data_dir", None, "Data directory")
+flags.DEFINE_bool("refresh_layout", False, "Probe the subject layout again")
 
 # Required flag.
 flags.mark_flag_as_required("project")
@@ -148,7 +134,7 @@ def get_conversations(data_dir: str) -> List[str]:
     Returns:
         A sorted list of conversation names.
     """
-    return sorted(glob.glob(os.path.join(data_dir, "*")))[:3]
+    return sorted(glob.glob(os.path.join(data_dir, "*")))
 
 
 def get_num_conversations(data_dir: str) -> int:
@@ -204,17 +190,15 @@ def get_datum_checksums(project: str, data_dir: str, subject: str) -> Dict[str,
     for conversation in get_conversations(data_dir):
         full_path = os.path.join(data_dir, conversation)
 
-        if os.path.isdir(os.path.join(full_path, "misc")):
-            datum_prefix = DATUM_FILE_MAP[project][subject]
-
-            datum_files = glob.glob(os.path.join(full_path, "misc", datum_prefix))
-
-            if len(datum_files) == 1:
-                datum_file = datum_files[0]
+        datum_pattern = layout.get_layout(
+            project, subject, data_dir, refresh=FLAGS.refresh_layout
+        ).datum_pattern
+        datum_file = layout.find_datum_file(full_path, datum_pattern)
 
-                checksum = calculate_checksum(datum_file)
+        if datum_file:
+            checksum = calculate_checksum(datum_file)
 
-                datum_file_dict[conversation] = checksum
+            datum_file_dict[conversation] = checksum
 
     return datum_file_dict
 
@@ -231,7 +215,10 @@ def get_electrode_folder(project: str, data_dir: str, conversation: str) -> str:
     Returns:
         str: The path to the electrode folder.
     """
-    electrode_folder = ELECTRODE_FOLDER_MAP[project][os.path.basename(data_dir)]
+    subject = os.path.basename(data_dir)
+    electrode_folder = layout.get_layout(
+        project, subject, data_dir, refresh=FLAGS.refresh_layout
+    ).electrode_folder
     return os.path.join(data_dir, conversation, electrode_folder)
 
 
@@ -286,7 +273,7 @@ def get_electrode_checksums(project: str, data_dir: str) -> dict:
     electrode_checksums = defaultdict(dict)
 
     for conversation, electrode_list in get_electrode_list(project, data_dir).items():
-        for electrode in electrode_list[:4]:
+        for electrode in electrode_list:
             electrode_folder = get_electrode_folder(project, data_dir, conversation)
             full_electrode_path = os.path.join(electrode_folder, electrode)
             electrode_checksums[conversation][electrode] = calculate_checksum(
@@ -1,8 +1,14 @@
 from datetime import datetime
 import glob
 import hashlib
+import mmap
 import os
-from typing import List, Tuple
+import queue
+import resource
+import shutil
+import sys
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from absl import app
 from absl import flags
@@ -10,6 +16,9 @@ from absl.flags._flagvalues import FlagValues
 
 import patient_info_pb2
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import layout  # noqa: E402
+
 SUBJECTS = {
     "podcast": [
         "661",
@@ -26,30 +35,21 @@ SUBJECTS = {
     "tfs": ["625", "676", "7170", "798", "7986"],
 }
 
-ELECTRODE_FOLDER_MAP = {
-    "podcast": dict.fromkeys(
-        SUBJECTS["podcast"],
-        "preprocessed_all",
-    ),
-    "tfs": dict.fromkeys(["625", "676"], "preprocessed")
-    | dict.fromkeys(["7170"], "preprocessed_v2")
-    | dict.fromkeys(["798"], "preprocessed_allElec"),
-}
-
-DATUM_FILE_MAP = {
-    "podcast": dict.fromkeys(
-        SUBJECTS["podcast"],
-        "*trimmed.txt",
-    ),
-    "tfs": dict.fromkeys(["625", "676"], "*trimmed.txt")
-    | dict.fromkeys(["7170", "798"], "*_datum_trimmed.txt"),
-}
-
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string("project", None, "Project ID")
 flags.DEFINE_string("subject", None, "Subject ID")
 flags.DEFINE_string("data_dir", None, "Data directory")
+flags.DEFINE_bool("refresh_layout", False, "Probe the subject layout again")
+flags.DEFINE_string(
+    "previous_manifest", None, "Manifest to reuse unchanged conversations from"
+)
+flags.DEFINE_integer(
+    "max_memory",
+    None,
+    "Stream the manifest to disk; MB of built conversations allowed to wait "
+    "for the writer, peak RSS above it is reported",
+)
 
 # Required flag.
 flags.mark_flag_as_required("project")
@@ -140,7 +140,7 @@ def get_conversations(data_dir: str) -> List[str]:
     Returns:
         A sorted list of conversation names.
     """
-    return sorted(glob.glob(os.path.join(data_dir, "*")))[:3]
+    return sorted(glob.glob(os.path.join(data_dir, "*")))
 
 
 def get_electrode_folder(project: str, data_dir: str, conversation: str) -> str:
@@ -155,7 +155,10 @@ def get_electrode_folder(project: str, data_dir: str, conversation: str) -> str:
     Returns:
         str: The path to the electrode folder.
     """
-    electrode_folder = ELECTRODE_FOLDER_MAP[project][os.path.basename(data_dir)]
+    subject = os.path.basename(data_dir)
+    electrode_folder = layout.get_layout(
+        project, subject, data_dir, refresh=FLAGS.refresh_layout
+    ).electrode_folder
     return os.path.join(data_dir, conversation, electrode_folder)
 
 
@@ -205,19 +208,10 @@ def get_datum_name_and_checksum(
     Returns:
         A tuple containing the name of the datum file and its checksum.
     """
-    datum_file = ""
+    datum_file = find_datum_file(project, subject, conversation)
     datum_checksum = ""
 
-    if os.path.isdir(os.path.join(conversation, "misc")):
-        datum_prefix = DATUM_FILE_MAP[project][subject]
-    else:
-        return datum_file, datum_checksum
-
-    datum_files = glob.glob(os.path.join(conversation, "misc", datum_prefix))
-
-    if len(datum_files) == 1:
-        datum_file = datum_files[0]
-    else:
+    if not datum_file:
         return datum_file, datum_checksum
 
     datum_checksum = calculate_checksum(datum_file)
@@ -225,6 +219,462 @@ def get_datum_name_and_checksum(
     return datum_file, datum_checksum
 
 
+def get_directory_fingerprint(directory: str) -> str:
+    """
+    Calculates a change fingerprint for a directory without opening its files.
+
+    The fingerprint combines the directory mtime and inode with a digest of
+    its sorted listing, so adding, removing or renaming a file changes it.
+    Files rewritten in place keep the directory mtime and are not detected.
+
+    Args:
+        directory (str): The path to the directory.
+
+    Returns:
+        str: The fingerprint, or an empty string if the directory is missing.
+    """
+    try:
+        stat = os.stat(directory)
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return ""
+
+    hasher = hashlib.sha256()
+    hasher.update(f"{stat.st_mtime_ns}:{stat.st_ino}\n".encode())
+    hasher.update("\0".join(names).encode())
+    return hasher.hexdigest()
+
+
+def get_conversation_fingerprint(
+    conversation: str, datum_file: str, electrode_folder_fingerprint: str
+) -> str:
+    """
+    Calculates a change fingerprint for a conversation.
+
+    Args:
+        conversation (str): The path to the conversation directory.
+        datum_file (str): The path to the datum file, or an empty string.
+        electrode_folder_fingerprint (str): The fingerprint of the electrode
+          folder of the conversation.
+
+    Returns:
+        str: The fingerprint of the conversation.
+    """
+    hasher = hashlib.sha256()
+    for path in [conversation, os.path.join(conversation, "misc"), datum_file]:
+        try:
+            stat = os.stat(path) if path else None
+        except FileNotFoundError:
+            stat = None
+        if stat is None:
+            hasher.update(b"-\n")
+        else:
+            hasher.update(
+                f"{stat.st_mtime_ns}:{stat.st_ino}:{stat.st_size}\n".encode()
+            )
+    hasher.update(electrode_folder_fingerprint.encode())
+    return hasher.hexdigest()
+
+
+def find_datum_file(project: str, subject: str, conversation: str) -> str:
+    """
+    Finds the datum file of a conversation without calculating its checksum.
+
+    Args:
+        project: The name of the project.
+        subject: The name of the subject.
+        conversation: The path to the conversation directory.
+
+    Returns:
+        The path to the datum file, or an empty string if there is not exactly
+        one match.
+    """
+    data_dir = os.path.dirname(os.path.normpath(conversation))
+    datum_pattern = layout.get_layout(
+        project, subject, data_dir, refresh=FLAGS.refresh_layout
+    ).datum_pattern
+    return layout.find_datum_file(conversation, datum_pattern)
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    Decodes a protobuf varint.
+
+    Args:
+        data: The buffer to decode from.
+        pos: The offset of the varint.
+
+    Returns:
+        The decoded integer and the offset after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def iter_fields(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Iterates over the fields of a serialized message without parsing it.
+
+    Args:
+        data: The buffer holding the message.
+        start: The offset of the message.
+        end: The offset after the message.
+
+    Yields:
+        The field number, and for length-delimited fields the start and end
+        of the value. For varints the value and -1 are yielded instead.
+    """
+    pos = start
+    while pos < end:
+        tag, pos = decode_varint(data, pos)
+        field_number, wire_type = tag >> 3, tag & 0x07
+        if wire_type == 0:
+            value, pos = decode_varint(data, pos)
+            yield field_number, value, -1
+        elif wire_type == 2:
+            length, pos = decode_varint(data, pos)
+            yield field_number, pos, pos + length
+            pos += length
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type: {wire_type}")
+
+
+class PreviousConversations:
+    """Conversations of a previous manifest, parsed on demand."""
+
+    def __init__(self, input_file: Optional[str], project_type: int, subject: str):
+        """
+        Indexes the conversations of a subject in a previous manifest.
+
+        The manifest is memory-mapped and only the offsets of the subject's
+        conversations are kept, so the previous manifest is never held in
+        memory as a whole.
+
+        Args:
+            input_file: The path to the previous manifest, or None for no
+              previous conversations.
+            project_type: The `ProjectType` of the subject.
+            subject: The name of the subject.
+        """
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self.data = b""
+        if input_file is None or os.path.getsize(input_file) == 0:
+            return
+
+        with open(input_file, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for field, start, end in iter_fields(self.data, 0, len(self.data)):
+            if field != 1:
+                continue
+
+            # Patient: project_type = 1, patient_id = 2, conversations = 3.
+            patient_type = patient_info_pb2.PODCAST
+            patient_id = ""
+            conversations = []
+            for patient_field, value, value_end in iter_fields(self.data, start, end):
+                if patient_field == 1:
+                    patient_type = value
+                elif patient_field == 2:
+                    patient_id = bytes(self.data[value:value_end]).decode()
+                elif patient_field == 3:
+                    conversations.append((value, value_end))
+
+            if patient_type != project_type or patient_id != subject:
+                continue
+
+            for conversation_start, conversation_end in conversations:
+                name = ""
+                for conversation_field, value, value_end in iter_fields(
+                    self.data, conversation_start, conversation_end
+                ):
+                    if conversation_field == 1:
+                        name = bytes(self.data[value:value_end]).decode()
+                self.offsets[name] = (conversation_start, conversation_end)
+
+    def get(self, name: str) -> Optional[patient_info_pb2.Patient.Conversation]:
+        """
+        Returns a previous conversation by name.
+
+        Args:
+            name: The name of the conversation.
+
+        Returns:
+            The parsed conversation, or None if it is not in the manifest.
+        """
+        if name not in self.offsets:
+            return None
+        start, end = self.offsets[name]
+        return patient_info_pb2.Patient.Conversation.FromString(self.data[start:end])
+
+
+def load_previous_conversations(
+    input_file: Optional[str], project_type: int, subject: str
+) -> PreviousConversations:
+    """
+    Loads the conversations of a subject from a previously written manifest.
+
+    Args:
+        input_file: The path to the previous manifest, or None.
+        project_type: The `ProjectType` of the subject.
+        subject: The name of the subject.
+
+    Returns:
+        The conversations, looked up by name and parsed on demand.
+    """
+    return PreviousConversations(input_file, project_type, subject)
+
+
+def build_conversation(
+    project: str,
+    subject: str,
+    data_dir: str,
+    conversation_path: str,
+    previous_conversations: PreviousConversations,
+) -> patient_info_pb2.Patient.Conversation:
+    """
+    Builds the message of a single conversation.
+
+    Args:
+        project: The name of the project.
+        subject: The name of the subject.
+        data_dir: The directory where the data is stored.
+        conversation_path: The path to the conversation directory.
+        previous_conversations: The conversations of a previous manifest by
+          name, reused as is when their fingerprint did not change.
+
+    Returns:
+        The conversation message.
+    """
+    conversation = patient_info_pb2.Patient.Conversation()
+    conversation.name = os.path.basename(conversation_path)
+
+    electrode_folder = get_electrode_folder(project, data_dir, conversation_path)
+    electrode_folder_fingerprint = get_directory_fingerprint(electrode_folder)
+    fingerprint = get_conversation_fingerprint(
+        conversation_path,
+        find_datum_file(project, subject, conversation_path),
+        electrode_folder_fingerprint,
+    )
+
+    # Reuse the whole conversation if nothing in it changed since the
+    # previous run.
+    previous = previous_conversations.get(conversation.name)
+    if previous is not None and previous.fingerprint == fingerprint:
+        conversation.CopyFrom(previous)
+        return conversation
+
+    conversation.fingerprint = fingerprint
+    conversation.electrode_folder_fingerprint = electrode_folder_fingerprint
+
+    datum_name, datum_checksum = get_datum_name_and_checksum(
+        project, subject, conversation_path
+    )
+    conversation.datum.name = os.path.basename(datum_name)
+    conversation.datum.checksum = datum_checksum
+
+    # Only the datum changed, the electrodes are kept from the previous run.
+    if (
+        previous is not None
+        and previous.electrode_folder_fingerprint == electrode_folder_fingerprint
+    ):
+        conversation.datum.electrodes.extend(previous.datum.electrodes)
+        return conversation
+
+    electrode_file_list = sorted(
+        layout.list_electrode_files(electrode_folder),
+        key=extract_integer_suffix,
+    )
+    for electrode_file in electrode_file_list:
+        electrode_checksum = calculate_checksum(electrode_file)
+
+        electrode = conversation.datum.electrodes.add()
+        electrode.name = os.path.basename(electrode_file)
+        electrode.checksum = electrode_checksum
+
+    return conversation
+
+
+class MemoryBudget:
+    """Bounds the number of bytes held by conversations in flight."""
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes (int): The budget in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, num_bytes: int) -> None:
+        """
+        Blocks until `num_bytes` fit in the budget.
+
+        A single item larger than the budget is let through once nothing
+        else is in flight, so the pipeline cannot deadlock.
+
+        Args:
+            num_bytes (int): The number of bytes to reserve.
+        """
+        with self.condition:
+            while self.used_bytes and self.used_bytes + num_bytes > self.max_bytes:
+                self.condition.wait()
+            self.used_bytes += num_bytes
+
+    def release(self, num_bytes: int) -> None:
+        """
+        Returns `num_bytes` to the budget.
+
+        Args:
+            num_bytes (int): The number of bytes to release.
+        """
+        with self.condition:
+            self.used_bytes -= num_bytes
+            self.condition.notify_all()
+
+
+def produce_conversations(
+    conversations: Iterable[patient_info_pb2.Patient.Conversation],
+    budget: MemoryBudget,
+) -> Iterator[patient_info_pb2.Patient.Conversation]:
+    """
+    Builds conversations in a background thread, bounded by a memory budget.
+
+    The caller must release the `ByteSize()` of every conversation it
+    receives from the budget once it is done with it.
+
+    Args:
+        conversations: The conversations to build, built lazily.
+        budget: The memory budget shared with the consumer.
+
+    Yields:
+        The conversations, in order.
+    """
+    pipeline: queue.Queue = queue.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for conversation in conversations:
+                budget.acquire(conversation.ByteSize())
+                pipeline.put(conversation)
+            pipeline.put(done)
+        except BaseException as e:
+            pipeline.put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    while True:
+        item = pipeline.get()
+        if item is done:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+    producer.join()
+
+
+def encode_varint(value: int) -> bytes:
+    """
+    Encodes an unsigned integer as a protobuf varint.
+
+    Args:
+        value: The integer to encode.
+
+    Returns:
+        The encoded bytes.
+    """
+    encoded = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(bits | 0x80)
+        else:
+            encoded.append(bits)
+            return bytes(encoded)
+
+
+def write_patient_streaming(
+    out_filename: str,
+    patient: patient_info_pb2.Patient,
+    conversations: Iterable[patient_info_pb2.Patient.Conversation],
+    max_memory: int,
+) -> None:
+    """
+    Writes a single-patient manifest one conversation at a time.
+
+    Conversations are serialized to a temporary file as soon as they are
+    built and then dropped. `max_memory` bounds the serialized size of the
+    built conversations waiting for the writer, not the process RSS, which
+    also holds the interpreter and the conversation being built. The
+    manifest is then assembled from the patient fields, the length of the
+    patient message and the temporary file, which gives the same bytes as
+    serializing the whole `PatientInfo`. Temporary files are removed even
+    if building a conversation fails.
+
+    Args:
+        out_filename: The path to the manifest.
+        patient: The patient, without conversations.
+        conversations: The conversations to write, built lazily.
+        max_memory: The budget in MB for conversations waiting to be
+          written.
+    """
+    budget = MemoryBudget(max_memory * 1024 * 1024)
+
+    # Field 3 of Patient, length-delimited.
+    conversation_tag = encode_varint(3 << 3 | 2)
+
+    tmp_filename = f"{out_filename}.conversations.tmp"
+    try:
+        with open(tmp_filename, "wb") as f:
+            for conversation in produce_conversations(conversations, budget):
+                size = conversation.ByteSize()
+                f.write(conversation_tag)
+                f.write(encode_varint(size))
+                f.write(conversation.SerializeToString())
+                del conversation
+                budget.release(size)
+            conversations_size = f.tell()
+
+        # Field 1 of PatientInfo, length-delimited.
+        patient_header = patient.SerializeToString()
+        with open(f"{out_filename}.tmp", "wb") as f, open(tmp_filename, "rb") as tmp:
+            f.write(encode_varint(1 << 3 | 2))
+            f.write(encode_varint(len(patient_header) + conversations_size))
+            f.write(patient_header)
+            shutil.copyfileobj(tmp, f)
+        os.replace(f"{out_filename}.tmp", out_filename)
+    finally:
+        for filename in [tmp_filename, f"{out_filename}.tmp"]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+def get_peak_rss() -> float:
+    """
+    Returns the peak resident set size of the process.
+
+    Returns:
+        The peak RSS in MB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
 def main(_):
     """Demonstrates using the protocol buffer API."""
     project, subject, data_dir = validate_flags(FLAGS)
@@ -232,7 +682,7 @@ def main(_):
     patient_info = patient_info_pb2.PatientInfo()
 
     patient = patient_info.patients.add()
-    
+
     if project == "podcast":
         patient.project_type = patient_info_pb2.PODCAST
     else:
@@ -241,33 +691,41 @@ def main(_):
 
     conversations = get_conversations(data_dir)
 
-    for conversation_path in conversations[:2]:
-        conversation = patient.conversations.add()
-        conversation.name = os.path.basename(conversation_path)
+    previous_manifest = FLAGS.previous_manifest
+    if previous_manifest and not os.path.isfile(previous_manifest):
+        previous_manifest = None
+    previous_conversations = load_previous_conversations(
+        previous_manifest, patient.project_type, subject
+    )
 
-        datum_name, datum_checksum = get_datum_name_and_checksum(
-            project, subject, conversation_path
+    conversation_messages = (
+        build_conversation(
+            project, subject, data_dir, conversation_path, previous_conversations
         )
-        conversation.datum.name = os.path.basename(datum_name)
-        conversation.datum.checksum = datum_checksum
-
-        electrode_folder = get_electrode_folder(project, data_dir, conversation_path)
-        electrode_file_list = sorted(
-            glob.glob(os.path.join(electrode_folder, "*.mat")),
-            key=extract_integer_suffix,
-        )
-        for electrode_file in electrode_file_list[:2]:
-            electrode_checksum = calculate_checksum(electrode_file)
-
-            electrode = conversation.datum.electrodes.add()
-            electrode.name = os.path.basename(electrode_file)
-            electrode.checksum = electrode_checksum
+        for conversation_path in conversations
+    )
 
     # Write the extracted patient info back to disk.
     # out_filename = get_out_filename(project, subject, data_dir)
     out_filename = f"{project}_{subject}.pb"
-    with open(out_filename, "wb") as f:
-        f.write(patient_info.SerializeToString())
+    if FLAGS.max_memory:
+        write_patient_streaming(
+            out_filename, patient, conversation_messages, FLAGS.max_memory
+        )
+    else:
+        patient.conversations.extend(conversation_messages)
+        with open(f"{out_filename}.tmp", "wb") as f:
+            f.write(patient_info.SerializeToString())
+        os.replace(f"{out_filename}.tmp", out_filename)
+
+    peak_rss = get_peak_rss()
+    print(f"Peak RSS: {peak_rss:.1f} MB")
+    if FLAGS.max_memory and peak_rss > FLAGS.max_memory:
+        print(
+            f"Warning: peak RSS is above --max_memory ({FLAGS.max_memory} MB), "
+            "which only bounds the conversations waiting to be written"
+        )
+
 
 if __name__ == "__main__":
     app.run(main)
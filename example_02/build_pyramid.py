@@ -0,0 +1,110 @@
+import os
+
+from absl import app
+from absl import flags
+from scipy.io import loadmat
+
+import add_patient
+import patient_info_pb2
+import pyramid
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input_file", None, "Manifest of the subject")
+flags.DEFINE_string("pyramid_dir", None, "Pyramid output directory")
+flags.DEFINE_string("mat_variable", "p1st", "Signal variable in the electrode files")
+flags.DEFINE_integer("block_size", 64, "Samples per row of the finest level")
+flags.DEFINE_integer("factor", 4, "Decimation factor between levels")
+
+# Required flag.
+flags.mark_flag_as_required("input_file")
+flags.mark_flag_as_required("pyramid_dir")
+
+
+def is_up_to_date(index, conversation: patient_info_pb2.Patient.Conversation) -> bool:
+    """
+    Checks whether a pyramid file matches the electrodes of a conversation.
+
+    Args:
+        index: The index of the pyramid file, or None.
+        conversation: The conversation from the manifest.
+
+    Returns:
+        True if the file holds exactly the electrodes and checksums of the
+        conversation, built with the current block size and factor.
+    """
+    if index is None:
+        return False
+    if index["block_size"] != FLAGS.block_size or index["factor"] != FLAGS.factor:
+        return False
+
+    checksums = {
+        name: entry["checksum"] for name, entry in index["electrodes"].items()
+    }
+    return checksums == {
+        electrode.name: electrode.checksum
+        for electrode in conversation.datum.electrodes
+    }
+
+
+def main(_):
+    """Precomputes the QC pyramids of every electrode in a manifest."""
+    project, subject, data_dir = add_patient.validate_flags(FLAGS)
+
+    patient_info = patient_info_pb2.PatientInfo()
+    with open(FLAGS.input_file, "rb") as f:
+        patient_info.ParseFromString(f.read())
+
+    for patient in patient_info.patients:
+        if patient.patient_id != subject:
+            continue
+
+        for conversation in patient.conversations:
+            index = pyramid.read_index(FLAGS.pyramid_dir, conversation.name)
+            if is_up_to_date(index, conversation):
+                continue
+
+            # Electrodes whose checksum did not change are copied over.
+            reusable = {}
+            if index is not None and (index["block_size"], index["factor"]) == (
+                FLAGS.block_size,
+                FLAGS.factor,
+            ):
+                reusable = {
+                    name: entry["checksum"]
+                    for name, entry in index["electrodes"].items()
+                }
+
+            conversation_path = os.path.join(data_dir, conversation.name)
+            electrode_folder = add_patient.get_electrode_folder(
+                project, data_dir, conversation_path
+            )
+
+            # Signals are reduced as soon as they are loaded, only their
+            # levels are kept until the file is written.
+            electrodes = []
+            for electrode in conversation.datum.electrodes:
+                num_samples, levels = 0, None
+                if reusable.get(electrode.name) != electrode.checksum:
+                    electrode_file = os.path.join(electrode_folder, electrode.name)
+                    signal = loadmat(electrode_file)[FLAGS.mat_variable].squeeze()
+                    num_samples = int(signal.size)
+                    levels = pyramid.build_levels(
+                        signal, FLAGS.block_size, FLAGS.factor
+                    )
+                    del signal
+                electrodes.append(
+                    (electrode.name, electrode.checksum, num_samples, levels)
+                )
+
+            pyramid.write_pyramid(
+                FLAGS.pyramid_dir,
+                conversation.name,
+                electrodes,
+                FLAGS.block_size,
+                FLAGS.factor,
+            )
+            print("Updated pyramid:", conversation.name)
+
+
+if __name__ == "__main__":
+    app.run(main)
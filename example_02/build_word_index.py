@@ -0,0 +1,99 @@
+import json
+import os
+from typing import List
+
+from absl import app
+from absl import flags
+
+import add_patient
+import patient_info_pb2
+import word_index
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("input_file", None, "Manifest of the subject")
+flags.DEFINE_string("index_dir", None, "Word index directory")
+
+# Required flag.
+flags.mark_flag_as_required("input_file")
+flags.mark_flag_as_required("index_dir")
+
+
+def get_indexed_conversations(
+    patient_info: patient_info_pb2.PatientInfo, subject: str
+) -> List[patient_info_pb2.Patient.Conversation]:
+    """
+    Returns the conversations of a subject that have a datum file.
+
+    Args:
+        patient_info: The manifest.
+        subject: The name of the subject.
+
+    Returns:
+        The conversations, in manifest order.
+    """
+    return [
+        conversation
+        for patient in patient_info.patients
+        if patient.patient_id == subject
+        for conversation in patient.conversations
+        if conversation.datum.checksum
+    ]
+
+
+def read_indexed_conversations(index_dir: str) -> List[List[str]]:
+    """
+    Returns the conversations the index was last merged from.
+
+    Args:
+        index_dir: The word index directory.
+
+    Returns:
+        The conversation names and datum checksums, or an empty list if the
+        index does not exist yet.
+    """
+    try:
+        current_dir = word_index.get_current_dir(index_dir)
+        with open(os.path.join(current_dir, "conversations.json"), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def main(_):
+    """Builds the word index of a subject from its manifest."""
+    project, subject, data_dir = add_patient.validate_flags(FLAGS)
+
+    patient_info = patient_info_pb2.PatientInfo()
+    with open(FLAGS.input_file, "rb") as f:
+        patient_info.ParseFromString(f.read())
+
+    conversations = get_indexed_conversations(patient_info, subject)
+    keys = [
+        [conversation.name, conversation.datum.checksum]
+        for conversation in conversations
+    ]
+
+    # Only datum files whose checksum has no segment yet are parsed.
+    num_parsed = 0
+    for conversation in conversations:
+        checksum = conversation.datum.checksum
+        if os.path.isfile(word_index.get_segment_path(FLAGS.index_dir, checksum)):
+            continue
+        datum_file = os.path.join(
+            data_dir, conversation.name, "misc", conversation.datum.name
+        )
+        word_index.write_segment(FLAGS.index_dir, checksum, datum_file)
+        num_parsed += 1
+
+    if num_parsed or read_indexed_conversations(FLAGS.index_dir) != keys:
+        word_index.merge_segments(FLAGS.index_dir, keys)
+        word_index.prune_segments(FLAGS.index_dir, [checksum for _, checksum in keys])
+
+    print(
+        f"Indexed {len(conversations)} conversation(s) of {project} {subject}, "
+        f"parsed {num_parsed} datum file(s)"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
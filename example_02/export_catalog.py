@@ -0,0 +1,262 @@
+import os
+import sqlite3
+from typing import Iterable, List, Tuple
+
+from absl import app
+from absl import flags
+
+import patient_info_pb2
+
+FLAGS = flags.FLAGS
+flags.DEFINE_multi_string("input_file", None, "Manifest(s) to load into the catalog")
+flags.DEFINE_string("catalog", "catalog.db", "SQLite catalog file")
+
+# Required flag.
+flags.mark_flag_as_required("input_file")
+
+SCHEMA = """
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    patient_id TEXT NOT NULL,
+    source TEXT,
+    UNIQUE (project, patient_id)
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    patient INTEGER NOT NULL REFERENCES patients (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    UNIQUE (patient, name)
+);
+
+CREATE TABLE IF NOT EXISTS datums (
+    conversation INTEGER PRIMARY KEY REFERENCES conversations (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS electrodes (
+    id INTEGER PRIMARY KEY,
+    conversation INTEGER NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    UNIQUE (conversation, name)
+);
+
+CREATE INDEX IF NOT EXISTS patients_patient_id ON patients (patient_id);
+CREATE INDEX IF NOT EXISTS conversations_name ON conversations (name);
+CREATE INDEX IF NOT EXISTS datums_checksum ON datums (checksum);
+CREATE INDEX IF NOT EXISTS datums_name ON datums (name);
+CREATE INDEX IF NOT EXISTS electrodes_checksum ON electrodes (checksum);
+CREATE INDEX IF NOT EXISTS electrodes_name ON electrodes (name);
+"""
+
+
+def get_project_name(project_type: int) -> str:
+    """
+    Returns the project name for a given project type.
+
+    Args:
+        project_type (int): The `ProjectType` enum value.
+
+    Returns:
+        str: The lower-case project name, e.g. "podcast" or "tfs".
+    """
+    return patient_info_pb2.ProjectType.Name(project_type).lower()
+
+
+def open_catalog(catalog: str) -> sqlite3.Connection:
+    """
+    Opens the SQLite catalog, creating its tables and indices if needed.
+
+    Args:
+        catalog (str): The path to the catalog file.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    connection = sqlite3.connect(catalog)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def read_manifest(input_file: str) -> patient_info_pb2.PatientInfo:
+    """
+    Reads a serialized `PatientInfo` manifest from disk.
+
+    Args:
+        input_file (str): The path to the manifest.
+
+    Returns:
+        patient_info_pb2.PatientInfo: The parsed manifest.
+    """
+    patient_info = patient_info_pb2.PatientInfo()
+    with open(input_file, "rb") as f:
+        patient_info.ParseFromString(f.read())
+    return patient_info
+
+
+def upsert_patient(
+    cursor: sqlite3.Cursor, patient: patient_info_pb2.Patient, source: str
+) -> int:
+    """
+    Inserts or updates a patient and returns its row id.
+
+    Args:
+        cursor (sqlite3.Cursor): The catalog cursor.
+        patient (patient_info_pb2.Patient): The patient to store.
+        source (str): The manifest the patient was loaded from.
+
+    Returns:
+        int: The row id of the patient.
+    """
+    return cursor.execute(
+        "INSERT INTO patients (project, patient_id, source) VALUES (?, ?, ?) "
+        "ON CONFLICT (project, patient_id) DO UPDATE SET source = excluded.source "
+        "RETURNING id",
+        (get_project_name(patient.project_type), patient.patient_id, source),
+    ).fetchone()[0]
+
+
+def upsert_conversations(
+    cursor: sqlite3.Cursor, patient_row: int, patient: patient_info_pb2.Patient
+) -> List[int]:
+    """
+    Synchronizes the conversations of a patient with the catalog.
+
+    Conversations that are no longer in the manifest are deleted together
+    with their datums and electrodes, the remaining ones keep their row ids.
+
+    Args:
+        cursor (sqlite3.Cursor): The catalog cursor.
+        patient_row (int): The row id of the patient.
+        patient (patient_info_pb2.Patient): The patient to store.
+
+    Returns:
+        List[int]: The row ids of the conversations, in manifest order.
+    """
+    names = [conversation.name for conversation in patient.conversations]
+
+    cursor.execute(
+        f"DELETE FROM conversations WHERE patient = ? "
+        f"AND name NOT IN ({', '.join('?' * len(names))})",
+        (patient_row, *names),
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO conversations (patient, name) VALUES (?, ?)",
+        ((patient_row, name) for name in names),
+    )
+
+    rows = dict(
+        cursor.execute(
+            "SELECT name, id FROM conversations WHERE patient = ?", (patient_row,)
+        )
+    )
+    return [rows[name] for name in names]
+
+
+def get_datum_rows(
+    conversation_rows: List[int], patient: patient_info_pb2.Patient
+) -> Iterable[Tuple[int, str, str]]:
+    """
+    Yields the datum rows of a patient.
+
+    Args:
+        conversation_rows (List[int]): The row ids of the conversations.
+        patient (patient_info_pb2.Patient): The patient to store.
+
+    Yields:
+        Tuple[int, str, str]: The conversation row id, datum name and checksum.
+    """
+    for row, conversation in zip(conversation_rows, patient.conversations):
+        if conversation.datum.name:
+            yield row, conversation.datum.name, conversation.datum.checksum
+
+
+def get_electrode_rows(
+    conversation_rows: List[int], patient: patient_info_pb2.Patient
+) -> Iterable[Tuple[int, str, str]]:
+    """
+    Yields the electrode rows of a patient.
+
+    Args:
+        conversation_rows (List[int]): The row ids of the conversations.
+        patient (patient_info_pb2.Patient): The patient to store.
+
+    Yields:
+        Tuple[int, str, str]: The conversation row id, electrode name and
+          checksum.
+    """
+    for row, conversation in zip(conversation_rows, patient.conversations):
+        for electrode in conversation.datum.electrodes:
+            yield row, electrode.name, electrode.checksum
+
+
+def load_patient(
+    cursor: sqlite3.Cursor, patient: patient_info_pb2.Patient, source: str
+) -> None:
+    """
+    Loads a patient into the catalog, replacing what was stored before.
+
+    Args:
+        cursor (sqlite3.Cursor): The catalog cursor.
+        patient (patient_info_pb2.Patient): The patient to store.
+        source (str): The manifest the patient was loaded from.
+    """
+    patient_row = upsert_patient(cursor, patient, source)
+    conversation_rows = upsert_conversations(cursor, patient_row, patient)
+
+    cursor.executemany(
+        "DELETE FROM datums WHERE conversation = ?",
+        ((row,) for row in conversation_rows),
+    )
+    cursor.executemany(
+        "DELETE FROM electrodes WHERE conversation = ?",
+        ((row,) for row in conversation_rows),
+    )
+    cursor.executemany(
+        "INSERT INTO datums (conversation, name, checksum) VALUES (?, ?, ?)",
+        get_datum_rows(conversation_rows, patient),
+    )
+    cursor.executemany(
+        "INSERT INTO electrodes (conversation, name, checksum) VALUES (?, ?, ?)",
+        get_electrode_rows(conversation_rows, patient),
+    )
+
+
+def export_catalog(connection: sqlite3.Connection, input_files: List[str]) -> int:
+    """
+    Loads the given manifests into the catalog in a single transaction.
+
+    Args:
+        connection (sqlite3.Connection): The catalog connection.
+        input_files (List[str]): The manifests to load.
+
+    Returns:
+        int: The number of patients loaded.
+    """
+    num_patients = 0
+    with connection:
+        cursor = connection.cursor()
+        for input_file in input_files:
+            patient_info = read_manifest(input_file)
+            for patient in patient_info.patients:
+                load_patient(cursor, patient, os.path.abspath(input_file))
+                num_patients += 1
+    return num_patients
+
+
+def main(_):
+    # Loads the manifests into the SQLite catalog.
+    connection = open_catalog(FLAGS.catalog)
+    num_patients = export_catalog(connection, FLAGS.input_file)
+    connection.close()
+
+    print(f"Loaded {num_patients} patient(s) into {FLAGS.catalog}")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,27 @@
+from absl import app
+from absl import flags
+
+import word_index
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("index_dir", None, "Word index directory")
+flags.DEFINE_multi_string("word", None, "Word(s) to look up")
+
+# Required flag.
+flags.mark_flag_as_required("index_dir")
+flags.mark_flag_as_required("word")
+
+
+def main(_):
+    # Prints every occurrence of the words without reading any datum file.
+    index = word_index.WordIndex(FLAGS.index_dir)
+
+    for word in FLAGS.word:
+        postings = index.lookup(word)
+        print(f"{word}: {len(postings)} occurrence(s)")
+        for posting in postings:
+            print(f"  {posting.conversation}\trow {posting.row}\tonset {posting.onset}")
+
+
+if __name__ == "__main__":
+    app.run(main)
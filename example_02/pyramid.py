@@ -0,0 +1,237 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DTYPE = np.float32
+
+# Every level stores one (min, max, rms) row per block.
+COLUMNS = 3
+
+
+def get_pyramid_paths(pyramid_dir: str, conversation: str) -> Tuple[str, str]:
+    """
+    Returns the data and index paths of the pyramid file of a conversation.
+
+    Args:
+        pyramid_dir (str): The pyramid directory.
+        conversation (str): The name of the conversation.
+
+    Returns:
+        Tuple[str, str]: The paths to the raw data file and its JSON index.
+    """
+    base = os.path.join(pyramid_dir, conversation)
+    return f"{base}.pyr", f"{base}.json"
+
+
+def build_levels(
+    signal: np.ndarray, block_size: int, factor: int
+) -> List[np.ndarray]:
+    """
+    Builds the min/max/RMS decimation pyramid of a signal.
+
+    Level 0 summarizes `block_size` samples per row, every following level
+    summarizes `factor` rows of the previous one, until a level has a single
+    row.
+
+    Args:
+        signal (np.ndarray): The full-rate signal.
+        block_size (int): The number of samples per row of level 0.
+        factor (int): The decimation factor between levels.
+
+    Returns:
+        List[np.ndarray]: The levels, finest first, each of shape (rows, 3).
+    """
+    signal = np.asarray(signal, dtype=np.float64).ravel()
+    if signal.size == 0:
+        return []
+
+    starts = np.arange(0, signal.size, block_size)
+    counts = np.diff(np.append(starts, signal.size))
+    mins = np.minimum.reduceat(signal, starts)
+    maxs = np.maximum.reduceat(signal, starts)
+    sums = np.add.reduceat(signal * signal, starts)
+
+    levels = []
+    while True:
+        levels.append(
+            np.column_stack([mins, maxs, np.sqrt(sums / counts)]).astype(DTYPE)
+        )
+        if len(mins) == 1:
+            return levels
+
+        starts = np.arange(0, len(mins), factor)
+        mins = np.minimum.reduceat(mins, starts)
+        maxs = np.maximum.reduceat(maxs, starts)
+        sums = np.add.reduceat(sums, starts)
+        counts = np.add.reduceat(counts, starts)
+
+
+def read_index(pyramid_dir: str, conversation: str) -> Optional[Dict]:
+    """
+    Reads the index of the pyramid file of a conversation.
+
+    Args:
+        pyramid_dir (str): The pyramid directory.
+        conversation (str): The name of the conversation.
+
+    Returns:
+        Optional[Dict]: The index, or None if the conversation has no pyramid
+        or the index does not match the data file.
+    """
+    data_path, index_path = get_pyramid_paths(pyramid_dir, conversation)
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        stat = os.stat(data_path)
+    except FileNotFoundError:
+        return None
+
+    # An index left over from an interrupted write describes another file.
+    if (index.get("data_size"), index.get("data_mtime_ns")) != (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        return None
+    return index
+
+
+def open_pyramid(pyramid_dir: str, conversation: str) -> Tuple[Dict, np.memmap]:
+    """
+    Memory-maps the pyramid file of a conversation.
+
+    Args:
+        pyramid_dir (str): The pyramid directory.
+        conversation (str): The name of the conversation.
+
+    Returns:
+        Tuple[Dict, np.memmap]: The index and the flat data of the file.
+    """
+    data_path, _ = get_pyramid_paths(pyramid_dir, conversation)
+    index = read_index(pyramid_dir, conversation)
+    if index is None:
+        raise FileNotFoundError(f"No pyramid for conversation: {conversation}")
+    return index, np.memmap(data_path, dtype=DTYPE, mode="r")
+
+
+def get_level(index: Dict, data: np.ndarray, electrode: str, level: int) -> np.ndarray:
+    """
+    Returns one level of an electrode pyramid.
+
+    Args:
+        index (Dict): The index of the pyramid file.
+        data (np.ndarray): The flat data of the pyramid file.
+        electrode (str): The name of the electrode.
+        level (int): The level, 0 being the finest.
+
+    Returns:
+        np.ndarray: A (rows, 3) view of the min, max and RMS columns.
+    """
+    offset, rows = index["electrodes"][electrode]["levels"][level]
+    return data[offset : offset + rows * COLUMNS].reshape(rows, COLUMNS)
+
+
+def read_range(
+    pyramid_dir: str,
+    conversation: str,
+    electrode: str,
+    start: int,
+    end: int,
+    max_points: int,
+) -> Tuple[int, np.ndarray]:
+    """
+    Reads the finest level of a sample range that fits in `max_points` rows.
+
+    Args:
+        pyramid_dir (str): The pyramid directory.
+        conversation (str): The name of the conversation.
+        electrode (str): The name of the electrode.
+        start (int): The first sample of the range.
+        end (int): The sample after the last one of the range.
+        max_points (int): The maximum number of rows to return.
+
+    Returns:
+        Tuple[int, np.ndarray]: The number of samples per row and the
+        (rows, 3) min, max and RMS values covering the range.
+    """
+    start = max(start, 0)
+    end = max(end, start)
+
+    index, data = open_pyramid(pyramid_dir, conversation)
+    num_levels = len(index["electrodes"][electrode]["levels"])
+
+    samples_per_row = index["block_size"]
+    for level in range(num_levels):
+        first = start // samples_per_row
+        last = -(-end // samples_per_row)
+        if last - first <= max_points or level == num_levels - 1:
+            rows = get_level(index, data, electrode, level)
+            return samples_per_row, np.array(rows[first:last])
+        samples_per_row *= index["factor"]
+
+    return samples_per_row, np.empty((0, COLUMNS), dtype=DTYPE)
+
+
+def write_pyramid(
+    pyramid_dir: str,
+    conversation: str,
+    electrodes: List[Tuple[str, str, int, Optional[List[np.ndarray]]]],
+    block_size: int,
+    factor: int,
+) -> None:
+    """
+    Writes the pyramid file of a conversation.
+
+    The data file and then the index are swapped in with `os.replace`. The
+    index records the size and mtime of its data file, so `read_index`
+    rejects it if the process died between the two steps.
+
+    Args:
+        pyramid_dir (str): The pyramid directory.
+        conversation (str): The name of the conversation.
+        electrodes (List[Tuple[str, str, int, Optional[List[np.ndarray]]]]):
+          The name, checksum, number of samples and levels from
+          `build_levels` of every electrode. Electrodes without levels are
+          copied from the existing pyramid file.
+        block_size (int): The number of samples per row of level 0.
+        factor (int): The decimation factor between levels.
+    """
+    os.makedirs(pyramid_dir, exist_ok=True)
+    data_path, index_path = get_pyramid_paths(pyramid_dir, conversation)
+
+    previous_index, previous_data = None, None
+    if any(levels is None for _, _, _, levels in electrodes):
+        previous_index, previous_data = open_pyramid(pyramid_dir, conversation)
+
+    index = {"block_size": block_size, "factor": factor, "electrodes": {}}
+    offset = 0
+    with open(f"{data_path}.tmp", "wb") as f:
+        for name, checksum, num_samples, levels in electrodes:
+            if levels is None:
+                entry = previous_index["electrodes"][name]
+                levels = [
+                    get_level(previous_index, previous_data, name, level)
+                    for level in range(len(entry["levels"]))
+                ]
+                num_samples = entry["num_samples"]
+
+            index["electrodes"][name] = {
+                "checksum": checksum,
+                "num_samples": num_samples,
+                "levels": [],
+            }
+            for level in levels:
+                index["electrodes"][name]["levels"].append([offset, len(level)])
+                f.write(np.ascontiguousarray(level, dtype=DTYPE).tobytes())
+                offset += level.size
+
+    del previous_data
+    os.replace(f"{data_path}.tmp", data_path)
+
+    stat = os.stat(data_path)
+    index["data_size"] = stat.st_size
+    index["data_mtime_ns"] = stat.st_mtime_ns
+    with open(f"{index_path}.tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(f"{index_path}.tmp", index_path)
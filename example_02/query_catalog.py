@@ -0,0 +1,98 @@
+import sqlite3
+from typing import Iterable, Optional, Tuple
+
+from absl import app
+from absl import flags
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("catalog", "catalog.db", "SQLite catalog file")
+flags.DEFINE_string("checksum", None, "Find datum and electrode files by checksum")
+flags.DEFINE_string("name", None, "Find datum and electrode files by name")
+flags.DEFINE_string("missing_datum", None, "List conversations of a subject without a datum")
+flags.DEFINE_string("project", None, "Restrict the lookups to a project")
+flags.DEFINE_string("sql", None, "Run an ad-hoc SQL query")
+
+QUERIES = {
+    "checksum": """
+        SELECT p.project, p.patient_id, c.name, d.name, d.checksum
+        FROM datums d
+        JOIN conversations c ON c.id = d.conversation
+        JOIN patients p ON p.id = c.patient
+        WHERE d.checksum = :value AND (:project IS NULL OR p.project = :project)
+        UNION ALL
+        SELECT p.project, p.patient_id, c.name, e.name, e.checksum
+        FROM electrodes e
+        JOIN conversations c ON c.id = e.conversation
+        JOIN patients p ON p.id = c.patient
+        WHERE e.checksum = :value AND (:project IS NULL OR p.project = :project)
+    """,
+    "name": """
+        SELECT p.project, p.patient_id, c.name, d.name, d.checksum
+        FROM datums d
+        JOIN conversations c ON c.id = d.conversation
+        JOIN patients p ON p.id = c.patient
+        WHERE d.name = :value AND (:project IS NULL OR p.project = :project)
+        UNION ALL
+        SELECT p.project, p.patient_id, c.name, e.name, e.checksum
+        FROM electrodes e
+        JOIN conversations c ON c.id = e.conversation
+        JOIN patients p ON p.id = c.patient
+        WHERE e.name = :value AND (:project IS NULL OR p.project = :project)
+    """,
+    "missing_datum": """
+        SELECT p.project, p.patient_id, c.name
+        FROM conversations c
+        JOIN patients p ON p.id = c.patient
+        LEFT JOIN datums d ON d.conversation = c.id
+        WHERE p.patient_id = :value
+        AND (:project IS NULL OR p.project = :project)
+        AND (d.checksum IS NULL OR d.checksum = '')
+        ORDER BY c.name
+    """,
+}
+
+
+def run_query(
+    connection: sqlite3.Connection,
+    query: str,
+    value: str,
+    project: Optional[str] = None,
+) -> Iterable[Tuple]:
+    """
+    Runs one of the predefined catalog queries.
+
+    Args:
+        connection (sqlite3.Connection): The catalog connection.
+        query (str): The name of the query in `QUERIES`.
+        value (str): The value to look up.
+        project (str, optional): The project to restrict the lookup to.
+          Defaults to all projects.
+
+    Returns:
+        Iterable[Tuple]: The matching rows.
+    """
+    return connection.execute(QUERIES[query], {"value": value, "project": project})
+
+
+def main(_):
+    # Answers lookups from the catalog without touching the manifests.
+    connection = sqlite3.connect(f"file:{FLAGS.catalog}?mode=ro", uri=True)
+
+    if FLAGS.sql is not None:
+        rows = connection.execute(FLAGS.sql)
+    else:
+        query = next((query for query in QUERIES if FLAGS[query].value), None)
+        if query is None:
+            raise app.UsageError(
+                "One of --checksum, --name, --missing_datum or --sql is required"
+            )
+        rows = run_query(connection, query, FLAGS[query].value, FLAGS.project)
+
+    for row in rows:
+        print("\t".join(str(column) for column in row))
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,217 @@
+import glob
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+from absl import app
+from absl import flags
+
+import patient_info_pb2
+
+FLAGS = flags.FLAGS
+flags.DEFINE_multi_string("input_file", [], "Manifest(s) to summarize")
+flags.DEFINE_string("input_glob", None, "Glob pattern of manifests to summarize")
+flags.DEFINE_integer("workers", None, "Number of worker processes")
+flags.DEFINE_bool("json", False, "Emit the report as JSON")
+
+
+def summarize_manifest(input_file: str) -> List[Dict[str, Any]]:
+    """
+    Summarizes every patient in a manifest.
+
+    Runs in a worker process, so it only returns plain Python objects.
+
+    Args:
+        input_file (str): The path to the manifest.
+
+    Returns:
+        List[Dict[str, Any]]: One summary per patient with its conversation
+        and datum counts, the electrode count of every conversation, the
+        named files with an empty checksum and the (checksum, file) pairs.
+    """
+    patient_info = patient_info_pb2.PatientInfo()
+    with open(input_file, "rb") as f:
+        patient_info.ParseFromString(f.read())
+
+    summaries = []
+    for patient in patient_info.patients:
+        project = patient_info_pb2.ProjectType.Name(patient.project_type).lower()
+        summary = {
+            "source": input_file,
+            "project": project,
+            "subject": patient.patient_id,
+            "num_conversations": len(patient.conversations),
+            "num_datums": 0,
+            "num_electrodes": {},
+            "missing_checksums": [],
+            "checksums": [],
+        }
+
+        for conversation in patient.conversations:
+            datum = conversation.datum
+            prefix = f"{project}/{patient.patient_id}/{conversation.name}"
+
+            # A conversation without a datum file only lowers the coverage.
+            if datum.name:
+                summary["num_datums"] += 1
+                files = [datum, *datum.electrodes]
+            else:
+                files = list(datum.electrodes)
+
+            summary["num_electrodes"][conversation.name] = len(datum.electrodes)
+
+            for file in files:
+                if file.checksum:
+                    location = f"{prefix}/{file.name}"
+                    summary["checksums"].append((file.checksum, location))
+                else:
+                    summary["missing_checksums"].append(f"{prefix}/{file.name}")
+
+        summaries.append(summary)
+
+    return summaries
+
+
+def get_input_files() -> List[str]:
+    """
+    Returns the manifests given by `--input_file` and `--input_glob`.
+
+    Returns:
+        List[str]: The sorted, de-duplicated manifest paths.
+    """
+    input_files = set(FLAGS.input_file)
+    if FLAGS.input_glob:
+        input_files.update(glob.glob(FLAGS.input_glob))
+    return sorted(input_files)
+
+
+def aggregate(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregates the patient summaries into a single report.
+
+    Args:
+        summaries (List[Dict[str, Any]]): The summaries of every patient.
+
+    Returns:
+        Dict[str, Any]: The per-project and per-subject totals, the subjects
+        found in several manifests, the files without a checksum and the
+        checksums shared by several files.
+    """
+    # A subject listed in several manifests is only counted once, the
+    # manifest loaded last wins.
+    subjects = {}
+    duplicate_subjects = defaultdict(list)
+    for summary in summaries:
+        key = (summary["project"], summary["subject"])
+        if key in subjects:
+            duplicate_subjects["/".join(key)].append(subjects[key]["source"])
+        subjects[key] = summary
+
+    locations = defaultdict(list)
+    projects = defaultdict(
+        lambda: {
+            "num_subjects": 0,
+            "num_conversations": 0,
+            "num_datums": 0,
+            "num_electrodes": 0,
+            "subjects": {},
+        }
+    )
+    missing_checksums = []
+
+    for (project_type, subject), summary in sorted(subjects.items()):
+        project = projects[project_type]
+        project["num_subjects"] += 1
+        project["num_conversations"] += summary["num_conversations"]
+        project["num_datums"] += summary["num_datums"]
+        project["num_electrodes"] += sum(summary["num_electrodes"].values())
+        project["subjects"][subject] = {
+            "source": summary["source"],
+            "num_conversations": summary["num_conversations"],
+            "num_datums": summary["num_datums"],
+            "datum_coverage": summary["num_datums"]
+            / max(summary["num_conversations"], 1),
+            "num_electrodes": summary["num_electrodes"],
+        }
+        missing_checksums.extend(summary["missing_checksums"])
+        for checksum, location in summary["checksums"]:
+            locations[checksum].append(location)
+
+    return {
+        "projects": dict(projects),
+        "duplicate_subjects": {
+            key: [*sources, subjects[tuple(key.split("/"))]["source"]]
+            for key, sources in duplicate_subjects.items()
+        },
+        "missing_checksums": missing_checksums,
+        "duplicate_checksums": {
+            checksum: files for checksum, files in locations.items() if len(files) > 1
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """
+    Prints a report in the style of `list_patient.py`.
+
+    Args:
+        report (Dict[str, Any]): The report built by `aggregate`.
+    """
+    for project_type, project in sorted(report["projects"].items()):
+        print("Project:", project_type)
+        print("  Subjects:", project["num_subjects"])
+        print("  Conversations:", project["num_conversations"])
+        print("  Datums:", project["num_datums"])
+        print("  Electrodes:", project["num_electrodes"])
+
+        for subject, summary in sorted(project["subjects"].items()):
+            counts = list(summary["num_electrodes"].values())
+            print("  Patient ID:", subject)
+            print("    Conversations:", summary["num_conversations"])
+            print(
+                f"    Datum coverage: {summary['num_datums']}/"
+                f"{summary['num_conversations']} ({summary['datum_coverage']:.0%})"
+            )
+            print("    Electrodes per conversation:", counts)
+
+    print("Duplicate subjects:", len(report["duplicate_subjects"]))
+    for subject, sources in report["duplicate_subjects"].items():
+        print("  ", subject, sources)
+
+    print("Missing checksums:", len(report["missing_checksums"]))
+    for location in report["missing_checksums"]:
+        print("  ", location)
+
+    print("Duplicate checksums:", len(report["duplicate_checksums"]))
+    for checksum, files in report["duplicate_checksums"].items():
+        print("  ", checksum)
+        for location in files:
+            print("    ", location)
+
+
+def main(_):
+    # Loads the manifests in parallel and prints one aggregate report.
+    input_files = get_input_files()
+    if not input_files:
+        raise app.UsageError("No manifests given by --input_file or --input_glob")
+
+    workers = FLAGS.workers or min(len(input_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = [
+            summary
+            for patient_summaries in executor.map(summarize_manifest, input_files)
+            for summary in patient_summaries
+        ]
+
+    report = aggregate(summaries)
+
+    if FLAGS.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    app.run(main)
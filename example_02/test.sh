@@ -1,9 +1,32 @@
 protocnew -I=. --python_out=. patient_info.proto
 
 python add_patient.py --project tfs --subject 625 --data_dir /projects/HASSON/247/data/conversations-car
+python add_patient.py --project tfs --subject 625 --data_dir /projects/HASSON/247/data/conversations-car --previous_manifest tfs_625.pb
 python list_patient.py --input_file tfs_625.pb
 
 echo ''
 
 python add_patient.py --project podcast --subject 661 --data_dir /projects/HASSON/247/data/podcast-data
-python list_patient.py --input_file podcast_661.pb
\ No newline at end of file
+python list_patient.py --input_file podcast_661.pb
+
+echo ''
+
+python export_catalog.py --input_file tfs_625.pb --input_file podcast_661.pb --catalog catalog.db
+python query_catalog.py --catalog catalog.db --missing_datum 625
+
+echo ''
+
+python build_word_index.py --project tfs --subject 625 --data_dir /projects/HASSON/247/data/conversations-car --input_file tfs_625.pb --index_dir word_index_625
+python lookup_word.py --index_dir word_index_625 --word hello
+
+echo ''
+
+python build_pyramid.py --project tfs --subject 625 --data_dir /projects/HASSON/247/data/conversations-car --input_file tfs_625.pb --pyramid_dir pyramid_625
+
+echo ''
+
+python summarize_manifests.py --input_glob '*.pb'
+
+echo ''
+
+python add_patient.py --project tfs --subject 7170 --data_dir /projects/HASSON/247/data/conversations-car --max_memory 256
\ No newline at end of file
@@ -0,0 +1,269 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+EXCLUDE_WORDS = ["sp", "{lg}", "{ns}", "{LG}", "{NS}", "SP"]
+
+NON_WORDS = ["hm", "huh", "mhm", "mm", "oh", "uh", "uhuh", "um"]
+
+ARRAYS = ["words", "offsets", "conversation_ids", "rows", "onsets"]
+
+# Symlink to the directory holding the arrays of the latest merge.
+CURRENT = "current"
+
+
+class Posting(NamedTuple):
+    conversation: str
+    row: int
+    onset: float
+
+
+def normalize_word(word: str) -> str:
+    """
+    Normalizes a datum word for indexing and lookup.
+
+    Args:
+        word (str): The word as written in the datum file.
+
+    Returns:
+        str: The lower-case word, or an empty string if it is excluded.
+    """
+    if word in EXCLUDE_WORDS or word.lower() in NON_WORDS:
+        return ""
+    return word.lower()
+
+
+def parse_datum_file(datum_file: str) -> Dict[str, np.ndarray]:
+    """
+    Extracts the postings of a datum file.
+
+    Every line of a datum file holds a word followed by its onset. Excluded
+    words and non-words are skipped but still count as rows.
+
+    Args:
+        datum_file (str): The path to the datum file.
+
+    Returns:
+        Dict[str, np.ndarray]: The words, rows and onsets of the postings.
+    """
+    words, rows, onsets = [], [], []
+    with open(datum_file, "r") as f:
+        for row, line in enumerate(f):
+            fields = line.split()
+            if not fields:
+                continue
+            word = normalize_word(fields[0])
+            if not word:
+                continue
+            try:
+                onset = float(fields[1])
+            except (IndexError, ValueError):
+                onset = np.nan
+            words.append(word)
+            rows.append(row)
+            onsets.append(onset)
+
+    return {
+        "words": np.array(words, dtype=str),
+        "rows": np.array(rows, dtype=np.uint32),
+        "onsets": np.array(onsets, dtype=np.float64),
+    }
+
+
+def get_current_dir(index_dir: str) -> str:
+    """
+    Returns the directory holding the arrays of the latest merge.
+
+    Args:
+        index_dir (str): The index directory.
+
+    Returns:
+        str: The resolved path, so it stays valid during a later merge.
+    """
+    return os.path.realpath(os.path.join(index_dir, CURRENT))
+
+
+def get_segment_path(index_dir: str, checksum: str) -> str:
+    """
+    Returns the path of the postings segment of a datum file.
+
+    Args:
+        index_dir (str): The index directory.
+        checksum (str): The checksum of the datum file.
+
+    Returns:
+        str: The path to the segment.
+    """
+    return os.path.join(index_dir, "segments", f"{checksum}.npz")
+
+
+def write_segment(index_dir: str, checksum: str, datum_file: str) -> None:
+    """
+    Parses a datum file and stores its postings as a segment.
+
+    Args:
+        index_dir (str): The index directory.
+        checksum (str): The checksum of the datum file.
+        datum_file (str): The path to the datum file.
+    """
+    segment_path = get_segment_path(index_dir, checksum)
+    os.makedirs(os.path.dirname(segment_path), exist_ok=True)
+
+    tmp_path = f"{segment_path}.tmp.npz"
+    np.savez(tmp_path, **parse_datum_file(datum_file))
+    os.replace(tmp_path, segment_path)
+
+
+def prune_segments(index_dir: str, checksums: List[str]) -> None:
+    """
+    Removes the segments of datum files that are no longer indexed.
+
+    Args:
+        index_dir (str): The index directory.
+        checksums (List[str]): The checksums of the indexed datum files.
+    """
+    keep = {os.path.basename(get_segment_path(index_dir, c)) for c in checksums}
+    segment_dir = os.path.dirname(get_segment_path(index_dir, ""))
+    for filename in os.listdir(segment_dir):
+        if filename not in keep:
+            os.remove(os.path.join(segment_dir, filename))
+
+
+def merge_segments(index_dir: str, conversations: List[List[str]]) -> None:
+    """
+    Merges the segments of the given conversations into the index.
+
+    The index is a set of `.npy` arrays: the sorted vocabulary, the start of
+    each word's postings, and per posting its conversation number, row and
+    onset, sorted by word, conversation and row. They live in a new
+    directory that replaces the previous one atomically.
+
+    Args:
+        index_dir (str): The index directory.
+        conversations (List[List[str]]): The conversation names and
+          datum checksums to merge, in manifest order.
+    """
+    os.makedirs(os.path.dirname(get_segment_path(index_dir, "")), exist_ok=True)
+
+    words, conversation_ids, rows, onsets = [], [], [], []
+    for idx, (_, checksum) in enumerate(conversations):
+        with np.load(get_segment_path(index_dir, checksum)) as segment:
+            words.append(segment["words"])
+            rows.append(segment["rows"])
+            onsets.append(segment["onsets"])
+        conversation_ids.append(np.full(len(rows[-1]), idx, dtype=np.uint32))
+
+    words = np.concatenate(words) if words else np.array([], dtype=str)
+    conversation_ids = np.concatenate(conversation_ids or [np.array([], np.uint32)])
+    rows = np.concatenate(rows or [np.array([], np.uint32)])
+    onsets = np.concatenate(onsets or [np.array([], np.float64)])
+
+    order = np.lexsort((rows, conversation_ids, words))
+    words = words[order]
+    vocabulary, starts = np.unique(words, return_index=True)
+
+    arrays = {
+        "words": vocabulary,
+        "offsets": np.append(starts, len(words)).astype(np.int64),
+        "conversation_ids": conversation_ids[order],
+        "rows": rows[order],
+        "onsets": onsets[order],
+    }
+    # The arrays are written to a fresh directory and published by swapping
+    # the `current` symlink, so readers never mix two merges.
+    merge_dir = tempfile.mkdtemp(prefix=".merge-", dir=index_dir)
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(merge_dir, 0o777 & ~umask)
+    for name, array in arrays.items():
+        np.save(os.path.join(merge_dir, f"{name}.npy"), array)
+
+    with open(os.path.join(merge_dir, "conversations.json"), "w") as f:
+        json.dump(conversations, f, indent=2)
+
+    publish_merge(index_dir, merge_dir)
+
+
+def publish_merge(index_dir: str, merge_dir: str) -> None:
+    """
+    Points the `current` symlink at a merged directory.
+
+    Publishing and the removal of older merges hold an exclusive lock on the
+    index, so concurrent merges never remove the directory that `current`
+    points to. Merges still being written are not named `index-*` yet and
+    are left alone.
+
+    Args:
+        index_dir (str): The index directory.
+        merge_dir (str): The directory written by `merge_segments`.
+    """
+    with open(os.path.join(index_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        published_dir = os.path.join(
+            index_dir, "index-" + os.path.basename(merge_dir)[len(".merge-") :]
+        )
+        os.rename(merge_dir, published_dir)
+
+        # A link left behind by an interrupted merge is replaced.
+        link = os.path.join(index_dir, f".{CURRENT}.tmp")
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(published_dir), link)
+        os.replace(link, os.path.join(index_dir, CURRENT))
+
+        current_dir = get_current_dir(index_dir)
+        for filename in os.listdir(index_dir):
+            path = os.path.realpath(os.path.join(index_dir, filename))
+            if filename.startswith("index-") and path != current_dir:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class WordIndex:
+    """Memory-mapped inverted index of datum words."""
+
+    def __init__(self, index_dir: str):
+        """
+        Opens an index written by `merge_segments`.
+
+        Args:
+            index_dir (str): The index directory.
+        """
+        current_dir = get_current_dir(index_dir)
+        with open(os.path.join(current_dir, "conversations.json"), "r") as f:
+            self.conversations = [name for name, _ in json.load(f)]
+
+        for name in ARRAYS:
+            array = np.load(os.path.join(current_dir, f"{name}.npy"), mmap_mode="r")
+            setattr(self, name, array)
+
+    def lookup(self, word: str) -> List[Posting]:
+        """
+        Returns every occurrence of a word.
+
+        Args:
+            word (str): The word to look up.
+
+        Returns:
+            List[Posting]: The postings of the word, sorted by conversation
+            and row.
+        """
+        word = normalize_word(word)
+        idx = np.searchsorted(self.words, word)
+        if not word or idx == len(self.words) or self.words[idx] != word:
+            return []
+
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return [
+            Posting(self.conversations[conversation], int(row), float(onset))
+            for conversation, row, onset in zip(
+                self.conversation_ids[start:end],
+                self.rows[start:end],
+                self.onsets[start:end],
+            )
+        ]
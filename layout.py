@@ -0,0 +1,320 @@
+import fnmatch
+import glob
+import json
+import os
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from absl import logging
+
+LAYOUT_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "247_proto",
+    "layout_cache.json",
+)
+
+# Electrode folders of subjects whose conversations also hold another
+# `preprocessed*` folder that the probe could pick instead.
+ELECTRODE_FOLDER_MAP = {
+    "tfs": {"7170": "preprocessed_v2", "798": "preprocessed_allElec"},
+}
+
+# Electrode folders shared by every subject of a project.
+PROJECT_ELECTRODE_FOLDERS = {"podcast": "preprocessed_all"}
+
+ELECTRODE_FOLDER_PREFIX = "preprocessed"
+
+# Datum patterns, most specific first.
+DATUM_PATTERNS = ["*_datum_trimmed.txt", "*trimmed.txt"]
+
+_layouts: Dict[str, "Layout"] = {}
+
+
+class Layout(NamedTuple):
+    electrode_folder: str
+    datum_pattern: str
+
+
+def count_electrode_files(folder: str) -> int:
+    """
+    Counts the electrode files in a folder.
+
+    Args:
+        folder (str): The path to the folder.
+
+    Returns:
+        int: The number of `.mat` files in the folder.
+    """
+    with os.scandir(folder) as entries:
+        return sum(entry.name.endswith(".mat") for entry in entries)
+
+
+def probe_electrode_folder(project: str, subject: str, conversation: str) -> str:
+    """
+    Detects the electrode folder of a conversation.
+
+    The folder from `ELECTRODE_FOLDER_MAP`, or else from
+    `PROJECT_ELECTRODE_FOLDERS`, is used if the conversation has it,
+    otherwise the `preprocessed*` folder with the most electrode files.
+
+    Args:
+        project (str): The name of the project.
+        subject (str): The name of the subject.
+        conversation (str): The path to the conversation directory.
+
+    Returns:
+        str: The name of the electrode folder, or an empty string if there is
+        none.
+    """
+    with os.scandir(conversation) as entries:
+        candidates = [
+            entry.name
+            for entry in entries
+            if entry.is_dir() and entry.name.startswith(ELECTRODE_FOLDER_PREFIX)
+        ]
+
+    hint = ELECTRODE_FOLDER_MAP.get(project, {}).get(
+        subject, PROJECT_ELECTRODE_FOLDERS.get(project)
+    )
+    if hint in candidates:
+        return hint
+
+    counts = {
+        folder: count_electrode_files(os.path.join(conversation, folder))
+        for folder in candidates
+    }
+    counts = {folder: count for folder, count in counts.items() if count}
+    if not counts:
+        return ""
+    return max(sorted(counts), key=counts.get)
+
+
+def probe_datum_pattern(conversation: str) -> str:
+    """
+    Detects the datum pattern of a conversation.
+
+    Args:
+        conversation (str): The path to the conversation directory.
+
+    Returns:
+        str: The most specific pattern of `DATUM_PATTERNS` that matches
+        exactly one file in the `misc` folder, or an empty string.
+    """
+    misc = os.path.join(conversation, "misc")
+    if not os.path.isdir(misc):
+        return ""
+
+    names = os.listdir(misc)
+    for pattern in DATUM_PATTERNS:
+        if len(fnmatch.filter(names, pattern)) == 1:
+            return pattern
+    return ""
+
+
+def probe_layout(
+    project: str, subject: str, data_dir: str
+) -> Tuple[Layout, Dict[str, int]]:
+    """
+    Detects the layout of a subject from its first conversations.
+
+    Conversations are inspected in sorted order until both the electrode
+    folder and the datum pattern are known, which is usually the first one.
+
+    Args:
+        project (str): The name of the project.
+        subject (str): The name of the subject.
+        data_dir (str): The directory of the subject.
+
+    Returns:
+        Tuple[Layout, Dict[str, int]]: The detected layout, with an empty
+        datum pattern if no conversation has a datum file, and the mtime of
+        every inspected conversation directory.
+
+    Raises:
+        ValueError: If no conversation has an electrode folder.
+    """
+    electrode_folder = ""
+    datum_pattern = ""
+    stamps = {}
+
+    for conversation in sorted(glob.glob(os.path.join(data_dir, "*"))):
+        if not os.path.isdir(conversation):
+            continue
+        stamps[conversation] = os.stat(conversation).st_mtime_ns
+        electrode_folder = electrode_folder or probe_electrode_folder(
+            project, subject, conversation
+        )
+        datum_pattern = datum_pattern or probe_datum_pattern(conversation)
+        if electrode_folder and datum_pattern:
+            break
+
+    if not electrode_folder:
+        raise ValueError(f"No electrode folder found in: {data_dir}")
+
+    return Layout(electrode_folder, datum_pattern), stamps
+
+
+def is_fresh(entry: Dict) -> bool:
+    """
+    Checks whether a cached layout still describes its conversations.
+
+    Adding or removing a folder in a conversation changes its mtime, so a
+    cached layout is stale once any inspected conversation changed.
+
+    Args:
+        entry (Dict): The cache entry.
+
+    Returns:
+        bool: True if none of the inspected conversations changed.
+    """
+    for conversation, mtime_ns in entry.get("stamps", {}).items():
+        try:
+            if os.stat(conversation).st_mtime_ns != mtime_ns:
+                return False
+        except FileNotFoundError:
+            return False
+    return bool(entry.get("stamps"))
+
+
+def read_layout_cache(cache_file: str) -> Dict[str, Dict]:
+    """
+    Reads the layout cache.
+
+    Args:
+        cache_file (str): The path to the cache file.
+
+    Returns:
+        Dict[str, Dict]: The cached layouts by subject directory, or an
+        empty dictionary if the cache is missing or unreadable.
+    """
+    try:
+        with open(cache_file, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_layout_cache(cache_file: str, key: str, entry: Dict) -> None:
+    """
+    Stores a layout in the cache.
+
+    The cache is read again right before writing, so layouts stored by other
+    processes in the meantime are kept, and it is replaced through a
+    per-process temporary file. A cache that cannot be written is skipped.
+
+    Args:
+        cache_file (str): The path to the cache file.
+        key (str): The subject directory.
+        entry (Dict): The layout and the mtimes it was probed from.
+    """
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    tmp_file = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache = read_layout_cache(cache_file)
+        cache[key] = entry
+
+        fd, tmp_file = tempfile.mkstemp(
+            prefix=".layout_cache-", suffix=".tmp", dir=cache_dir
+        )
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.warning("Could not write layout cache %s: %s", cache_file, e)
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def get_layout(
+    project: str,
+    subject: str,
+    data_dir: str,
+    cache_file: Optional[str] = None,
+    refresh: bool = False,
+) -> Layout:
+    """
+    Returns the layout of a subject, probing and caching it on first use.
+
+    The layout is probed again when the cached one is stale or `refresh` is
+    set. It is probed at most once per process. A layout without a datum
+    pattern falls back to the most generic pattern and is not cached.
+
+    Args:
+        project (str): The name of the project.
+        subject (str): The name of the subject.
+        data_dir (str): The directory of the subject.
+        cache_file (str, optional): The path to the cache file. Defaults to
+          `LAYOUT_CACHE`.
+        refresh (bool, optional): Ignore the cached layout. Defaults to False.
+
+    Returns:
+        Layout: The layout of the subject.
+    """
+    cache_file = cache_file or LAYOUT_CACHE
+    key = os.path.abspath(data_dir)
+    if key in _layouts:
+        return _layouts[key]
+
+    entry = read_layout_cache(cache_file).get(key)
+    if not refresh and entry is not None and is_fresh(entry):
+        layout = Layout(entry["electrode_folder"], entry["datum_pattern"])
+    else:
+        layout, stamps = probe_layout(project, subject, data_dir)
+        if layout.datum_pattern:
+            write_layout_cache(
+                cache_file,
+                key,
+                {
+                    "project": project,
+                    "subject": subject,
+                    **layout._asdict(),
+                    "stamps": stamps,
+                },
+            )
+        else:
+            layout = layout._replace(datum_pattern=DATUM_PATTERNS[-1])
+
+    _layouts[key] = layout
+    return layout
+
+
+def find_datum_file(conversation: str, datum_pattern: str) -> str:
+    """
+    Finds the datum file of a conversation.
+
+    Args:
+        conversation (str): The path to the conversation directory.
+        datum_pattern (str): The datum pattern of the subject.
+
+    Returns:
+        str: The path to the datum file, or an empty string if there is not
+        exactly one match.
+    """
+    misc = os.path.join(conversation, "misc")
+    try:
+        datum_files = fnmatch.filter(os.listdir(misc), datum_pattern)
+    except FileNotFoundError:
+        return ""
+
+    if len(datum_files) != 1:
+        return ""
+    return os.path.join(misc, datum_files[0])
+
+
+def list_electrode_files(electrode_folder: str) -> List[str]:
+    """
+    Lists the electrode files of a conversation.
+
+    Args:
+        electrode_folder (str): The path to the electrode folder.
+
+    Returns:
+        List[str]: The paths to the `.mat` files, in directory order, or an
+        empty list if the folder does not exist.
+    """
+    try:
+        with os.scandir(electrode_folder) as entries:
+            return [entry.path for entry in entries if entry.name.endswith(".mat")]
+    except FileNotFoundError:
+        return []